@@ -10,127 +10,254 @@ import json
 import math
 import sys
 
-def slideVec2d(point, angle=0, offset=0):
-    # same convention as original: angle in degrees, z uses negative sin
-    x = point[0] + math.cos(angle * math.pi / 180.0) * offset
-    z = point[2] - math.sin(angle * math.pi / 180.0) * offset
-    return (x, point[1], z)
-
-class TrackDetailNode:
-    def __init__(self, rawIdeal, prevRawIdeal, rawDetail):
-        # rawIdeal: (x, y, z, distance, id)
-        self.id = rawIdeal[4]
-        self.position = (rawIdeal[0], rawIdeal[1], rawIdeal[2])
-        self.distance = rawIdeal[3]
-        self.direction = -math.degrees(
-            math.atan2(prevRawIdeal[2] - self.position[1],
-                       self.position[0] - prevRawIdeal[0])
-        )
+try:
+    import numpy as np
+except ImportError:
+    # Assetto Corsa's embedded Python ships without numpy; the struct parser is used instead
+    np = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    # optional compiled kernel, see fastlane_decoder_cy.pyx
+    from fastlane_decoder_cy import node_fields as _cy_node_fields
+except ImportError:
+    _cy_node_fields = None
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# Walls are the node position slid sideways by the rawDetail offsets, at
+# -direction +/- 90 degrees (x uses cos, z uses negative sin). With
+# a = radians(-direction), c = cos(a), s = sin(a) that reduces to:
+#   wallLeft  = (x - s * offsetLeft,  z - c * offsetLeft)
+#   wallRight = (x + s * offsetRight, z + c * offsetRight)
+# so one cos/sin pair per node serves both walls.
+
+# fast_lane.ai record layouts: rawIdeal is (x, y, z, distance, id), rawDetail is 18 floats
+_HEADER = struct.Struct("<4i")
+_IDEAL = struct.Struct("<4f i")
+_COUNT = struct.Struct("<i")
+_DETAIL = struct.Struct("<18f")
+if np is not None:
+    _IDEAL_DTYPE = np.dtype([('x', '<f4'), ('y', '<f4'), ('z', '<f4'), ('d', '<f4'), ('id', '<i4')])
+    _DETAIL_DTYPE = np.dtype('<f4')
+
+# buffer size for the output writers, large enough to avoid many small writes
+OUTPUT_BUFFER_SIZE = 1 << 20
+
+NODE_COLUMNS = (
+    "id", "x", "y", "z", "distance", "direction",
+    "wallLeft_x", "wallLeft_y", "wallLeft_z",
+    "wallRight_x", "wallRight_y", "wallRight_z",
+    "trackCenter_x", "trackCenter_y", "trackCenter_z",
+)
+
+if njit is not None:
+    # not parallel=True: the app runs this on its prepare thread, and numba's
+    # parallel backend called from a non-main thread hangs interpreter shutdown
+    @njit(fastmath=True, cache=True)
+    def _nb_node_fields(x, z, x_prev, z_prev, wall_left, wall_right):
+        # numba twin of fastlane_decoder_cy.node_fields, same (n, 7) column layout
+        n = x.shape[0]
+        out = np.empty((n, 7), dtype=np.float64)
+        for i in range(n):
+            direction = -math.degrees(math.atan2(z_prev[i] - z[i], x[i] - x_prev[i]))
+            a = math.radians(-direction)
+            c = math.cos(a)
+            s = math.sin(a)
+            wlx = x[i] - s * wall_left[i]
+            wlz = z[i] - c * wall_left[i]
+            wrx = x[i] + s * wall_right[i]
+            wrz = z[i] + c * wall_right[i]
+            out[i, 0] = direction
+            out[i, 1] = wlx
+            out[i, 2] = wlz
+            out[i, 3] = wrx
+            out[i, 4] = wrz
+            out[i, 5] = (wlx + wrx) / 2.0
+            out[i, 6] = (wlz + wrz) / 2.0
+        return out
+else:
+    _nb_node_fields = None
+
+# compiled per-node kernel, preferring the Cython build over numba; None = pure numpy
+_node_fields = _cy_node_fields or _nb_node_fields
+
+def _readRawFastLane(buf, length, extraCount):
+    # struct parser used when numpy is not available; buf has been length-checked
+    off = _HEADER.size
+
+    # "rawIdeal" entries: length entries of (4 floats, 1 int) == 5 items, each 4 bytes
+    rawIdeal = []
+    for i in range(length):
+        rawIdeal.append(_IDEAL.unpack_from(buf, off))
+        off += _IDEAL.size
+
+    # skip extraCount, then that many rawDetail blocks (18 floats each)
+    off += _COUNT.size
+    rawDetail = []
+    for i in range(extraCount):
+        rawDetail.append(_DETAIL.unpack_from(buf, off))
+        off += _DETAIL.size
+    return rawIdeal, rawDetail
+
+def _build_node_lists(rawIdeal, rawDetail):
+    # pure-Python variant of build_node_arrays, used when numpy is not available
+    cols = dict((key, []) for key in NODE_COLUMNS)
+    length = len(rawIdeal)
+    for i in range(min(length, len(rawDetail))):
+        x, y, z, distance, ident = rawIdeal[i]
+        prevRawIdeal = rawIdeal[i - 1] if i > 0 else rawIdeal[length - 1]
+        direction = -math.degrees(math.atan2(prevRawIdeal[2] - z, x - prevRawIdeal[0]))
         # rawDetail contains many floats; original used indices 5 and 6 for wall offsets
-        try:
-            _wallLeft = rawDetail[5]
-            _wallRight = rawDetail[6]
-            self.wallLeft = slideVec2d(self.position, -self.direction + 90, _wallLeft)
-            self.wallRight = slideVec2d(self.position, -self.direction - 90, _wallRight)
-            self.trackCenter = ((self.wallLeft[0] + self.wallRight[0]) / 2.0,
-                                (self.wallLeft[1] + self.wallRight[1]) / 2.0,
-                                (self.wallLeft[2] + self.wallRight[2]) / 2.0)
-        except Exception:
-            self.wallLeft = None
-            self.wallRight = None
-            self.trackCenter = self.position
+        a = math.radians(-direction)
+        c, s = math.cos(a), math.sin(a)
+        wallLeft = (x - s * rawDetail[i][5], y, z - c * rawDetail[i][5])
+        wallRight = (x + s * rawDetail[i][6], y, z + c * rawDetail[i][6])
+        values = (ident, x, y, z, distance, direction) + wallLeft + wallRight + (
+            (wallLeft[0] + wallRight[0]) / 2.0,
+            (wallLeft[1] + wallRight[1]) / 2.0,
+            (wallLeft[2] + wallRight[2]) / 2.0)
+        for key, value in zip(NODE_COLUMNS, values):
+            cols[key].append(value)
+    return cols
+
+def build_node_arrays(ideal, detail):
+    """Compute all node fields as parallel columns (one entry per node).
+
+    ideal holds the rawIdeal records (x, y, z, distance, id), detail the 18-float
+    rawDetail records. Returns a dict of column name -> np.ndarray (plain lists
+    when numpy is not available), keyed by NODE_COLUMNS.
+    """
+    if np is None:
+        return _build_node_lists(ideal, detail)
+
+    ideal = np.asarray(ideal, dtype=_IDEAL_DTYPE)
+    detail = np.asarray(detail, dtype=np.float64).reshape(-1, 18)
+    n = min(len(ideal), len(detail))
+
+    ix = ideal['x'].astype(np.float64)
+    iy = ideal['y'].astype(np.float64)
+    iz = ideal['z'].astype(np.float64)
+    # prevRawIdeal for every node at once, wrapping node 0 to the last rawIdeal
+    ix_prev = np.roll(ix, 1)[:n]
+    iz_prev = np.roll(iz, 1)[:n]
+    x, y, z = ix[:n], iy[:n], iz[:n]
+
+    if _node_fields is not None:
+        fields = _node_fields(x, z, ix_prev, iz_prev,
+                              np.ascontiguousarray(detail[:n, 5]),
+                              np.ascontiguousarray(detail[:n, 6]))
+        direction, wallLeft_x, wallLeft_z, wallRight_x, wallRight_z, center_x, center_z = fields.T
+    else:
+        direction = -np.degrees(np.arctan2(iz_prev - z, x - ix_prev))
+
+        a = np.deg2rad(-direction)
+        # unit vector towards the left wall in the (x, z) plane; the right wall lies opposite
+        lateral = np.stack([-np.sin(a), -np.cos(a)], axis=1)
+        offsets = np.stack([detail[:n, 5], -detail[:n, 6]], axis=1)
+        # both walls in one broadcast: (n, 1, 2) positions + (n, 2, 1) offsets * (n, 1, 2) lateral
+        walls = np.stack([x, z], axis=1)[:, None, :] + offsets[:, :, None] * lateral[:, None, :]
+        wallLeft_x, wallLeft_z = walls[:, 0, 0], walls[:, 0, 1]
+        wallRight_x, wallRight_z = walls[:, 1, 0], walls[:, 1, 1]
+        center_x, center_z = walls.mean(axis=1).T
+
+    return {
+        "id": ideal['id'][:n],
+        "x": x,
+        "y": y,
+        "z": z,
+        "distance": ideal['d'][:n],
+        "direction": direction,
+        "wallLeft_x": wallLeft_x,
+        "wallLeft_y": y,
+        "wallLeft_z": wallLeft_z,
+        "wallRight_x": wallRight_x,
+        "wallRight_y": y,
+        "wallRight_z": wallRight_z,
+        "trackCenter_x": center_x,
+        "trackCenter_y": y,
+        "trackCenter_z": center_z,
+    }
 
 def getNodesFromFastLane(fai_file):
-    nodes = []
     try:
         with open(fai_file, "rb") as buffer:
-            # header: 4 ints (header, length, lapTime, sampleCount)
-            header_data = buffer.read(4 * 4)
-            if len(header_data) < 16:
-                raise ValueError("File too short or invalid header.")
-            header, length, lapTime, sampleCount = struct.unpack("4i", header_data)
-
-            # read "rawIdeal" entries: length entries of (4 floats, 1 int) == 5 items, each 4 bytes
-            rawIdeal = []
-            for i in range(length):
-                rec = buffer.read(4 * 5)
-                if len(rec) < 20:
-                    raise ValueError("Unexpected end of file while reading rawIdeal.")
-                # 4 floats and 1 int
-                a, b, c, d, ident = struct.unpack("4f i", rec)
-                rawIdeal.append((a, b, c, d, ident))
-
-            # read extraCount and then that many rawDetail blocks (18 floats each in original)
-            extraCountBytes = buffer.read(4)
-            if len(extraCountBytes) < 4:
-                extraCount = 0
-            else:
-                extraCount = struct.unpack("i", extraCountBytes)[0]
-
-            for i in range(extraCount):
-                prevRawIdeal = rawIdeal[i - 1] if i > 0 else rawIdeal[length - 1]
-                try:
-                    # read 18 floats (72 bytes)
-                    rawDetailBytes = buffer.read(4 * 18)
-                    if len(rawDetailBytes) < 4 * 18:
-                        # fallback: try to continue with zeros
-                        rawDetail = tuple([0.0] * 18)
-                    else:
-                        rawDetail = struct.unpack("18f", rawDetailBytes)
-                    node = TrackDetailNode(rawIdeal[i], prevRawIdeal, rawDetail)
-                    nodes.append(node)
-                except Exception:
-                    # ignore invalid node but continue
-                    continue
-
-        return nodes
+            buf = buffer.read()
+
+        # header: 4 ints (header, length, lapTime, sampleCount)
+        if len(buf) < _HEADER.size:
+            raise ValueError("File too short or invalid header.")
+        header, length, lapTime, sampleCount = _HEADER.unpack_from(buf, 0)
+
+        # validate the whole layout once, so the parsers below need no per-record checks
+        if length < 0:
+            raise ValueError("Invalid rawIdeal count {}.".format(length))
+        extraOffset = _HEADER.size + _IDEAL.size * length
+        if len(buf) < extraOffset + _COUNT.size:
+            raise ValueError("Unexpected end of file: expected at least {} bytes, got {}.".format(
+                extraOffset + _COUNT.size, len(buf)))
+        extraCount = _COUNT.unpack_from(buf, extraOffset)[0]
+        if extraCount < 0:
+            raise ValueError("Invalid rawDetail count {}.".format(extraCount))
+        expected_len = extraOffset + _COUNT.size + _DETAIL.size * extraCount
+        if len(buf) < expected_len:
+            raise ValueError("Unexpected end of file: expected {} bytes, got {}.".format(expected_len, len(buf)))
+
+        if np is not None:
+            ideal = np.frombuffer(buf, dtype=_IDEAL_DTYPE, count=length, offset=_HEADER.size)
+            detail = np.frombuffer(buf, dtype=_DETAIL_DTYPE, count=extraCount * 18,
+                                   offset=extraOffset + _COUNT.size).reshape(-1, 18)
+        else:
+            ideal, detail = _readRawFastLane(buf, length, extraCount)
+
+        return build_node_arrays(ideal, detail)
     except Exception as e:
         raise RuntimeError("Failed to parse '{}': {}".format(fai_file, e))
 
+def _as_list(col):
+    return col.tolist() if hasattr(col, "tolist") else col
+
+def rotateY90(xs, zs):
+    """Rotate coordinate columns 90° CCW around Y: (x, z) -> (z, -x)."""
+    if np is not None and isinstance(xs, np.ndarray):
+        return zs.copy(), -xs
+    return list(zs), [-x for x in xs]
+
 def nodes_to_dicts(nodes, include_walls=False, subsample=1):
-    out = []
-    for idx, n in enumerate(nodes):
-        if idx % subsample != 0:
-            continue
-        
-        x, y, z = n.position
-        x, z = z, -x  # rotate 90° CCW around Y
-
-        d = {
-            "index": idx,
-            "id": n.id,
-            "x": x,
-            "y": y,
-            "z": z,
-            "distance": n.distance,
-            "direction": n.direction
-        }
-
-        if include_walls:
-            if n.wallLeft is not None:
-                wx, wy, wz = n.wallLeft
-                wx, wz = wz, -wx
-                d.update({
-                    "wallLeft_x": wx,
-                    "wallLeft_y": wy,
-                    "wallLeft_z": wz,
-                })
-            else:
-                d.update({"wallLeft_x": None, "wallLeft_y": None, "wallLeft_z": None})
-
-            if n.wallRight is not None:
-                wx, wy, wz = n.wallRight
-                wx, wz = wz, -wx
-                d.update({
-                    "wallRight_x": wx,
-                    "wallRight_y": wy,
-                    "wallRight_z": wz,
-                })
-            else:
-                d.update({"wallRight_x": None, "wallRight_y": None, "wallRight_z": None})
+    # subsample every column once up front so skipped nodes are never rotated or converted
+    def col(key):
+        return nodes[key][::subsample]
+
+    indices = range(0, len(nodes["id"]), subsample)
+    xs, zs = rotateY90(col("x"), col("z"))
+    ids, xs, ys, zs = _as_list(col("id")), _as_list(xs), _as_list(col("y")), _as_list(zs)
+    dists = _as_list(col("distance"))
+    dirs = _as_list(col("direction"))
 
-        out.append(d)
-    return out
+    if not include_walls:
+        return [
+            {"index": idx, "id": ident, "x": x, "y": y, "z": z, "distance": dist, "direction": direction}
+            for idx, ident, x, y, z, dist, direction in zip(indices, ids, xs, ys, zs, dists, dirs)
+        ]
+
+    wlx, wlz = rotateY90(col("wallLeft_x"), col("wallLeft_z"))
+    wlx, wly, wlz = _as_list(wlx), _as_list(col("wallLeft_y")), _as_list(wlz)
+    wrx, wrz = rotateY90(col("wallRight_x"), col("wallRight_z"))
+    wrx, wry, wrz = _as_list(wrx), _as_list(col("wallRight_y")), _as_list(wrz)
+    return [
+        {"index": idx, "id": ident, "x": x, "y": y, "z": z, "distance": dist, "direction": direction,
+         "wallLeft_x": lx, "wallLeft_y": ly, "wallLeft_z": lz,
+         "wallRight_x": rx, "wallRight_y": ry, "wallRight_z": rz}
+        for idx, ident, x, y, z, dist, direction, lx, ly, lz, rx, ry, rz
+        in zip(indices, ids, xs, ys, zs, dists, dirs, wlx, wly, wlz, wrx, wry, wrz)
+    ]
 
 def write_csv(dicts, out_file):
     import csv
@@ -138,21 +265,28 @@ def write_csv(dicts, out_file):
         print("No data to write.")
         return
     keys = list(dicts[0].keys())
-    with open(out_file, "w", newline='') as f:
+    with open(out_file, "w", newline='', buffering=OUTPUT_BUFFER_SIZE) as f:
         w = csv.DictWriter(f, fieldnames=keys)
         w.writeheader()
-        for row in dicts:
-            w.writerow(row)
+        w.writerows(dicts)
 
 def write_json(dicts, out_file):
-    with open(out_file, "w") as f:
-        json.dump(dicts, f, indent=2)
+    # serialize in one go and write once; json.dump would issue a write per token
+    if orjson is not None:
+        data = orjson.dumps(dicts, option=orjson.OPT_INDENT_2)
+    else:
+        data = json.dumps(dicts, indent=2).encode("utf-8")
+    with open(out_file, "wb", buffering=OUTPUT_BUFFER_SIZE) as f:
+        f.write(data)
+
+def _txt_lines(dicts):
+    # default: x,z pairs; %-formatting rather than f-strings, the module is also
+    # imported by the AC app whose embedded Python predates them
+    return ("%.6f,%.6f\n" % (d['x'], d['z']) for d in dicts)
 
 def write_txt(dicts, out_file):
-    with open(out_file, "w") as f:
-        for d in dicts:
-            # default: x,z pairs
-            f.write("{0:.6f},{1:.6f}\n".format(d['x'], d['z']))
+    with open(out_file, "w", buffering=OUTPUT_BUFFER_SIZE) as f:
+        f.writelines(_txt_lines(dicts))
 
 def main():
     parser = argparse.ArgumentParser(description="Extract coordinates from Assetto Corsa fast_lane.ai files.")
@@ -189,11 +323,9 @@ def main():
                     keys = list(dicts[0].keys())
                     w = csv.DictWriter(_sys.stdout, fieldnames=keys)
                     w.writeheader()
-                    for row in dicts:
-                        w.writerow(row)
+                    w.writerows(dicts)
             else:  # txt
-                for d in dicts:
-                    print("{0:.6f},{1:.6f}".format(d['x'], d['z']))
+                sys.stdout.writelines(_txt_lines(dicts))
         else:
             out = args.out
             # if multiple inputs and out is a dir or missing extension, write to directory
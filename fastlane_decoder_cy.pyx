@@ -0,0 +1,45 @@
+# cython: language_level=3
+"""
+Optional compiled kernel for fastlane_decoder.build_node_arrays.
+
+Build in place with `cythonize -i fastlane_decoder_cy.pyx`; when the extension
+is missing fastlane_decoder falls back to its numpy implementation.
+"""
+import numpy as np
+cimport cython
+from cython.parallel cimport prange
+from libc.math cimport atan2, cos, sin, M_PI
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+def node_fields(const double[::1] x, const double[::1] z,
+                const double[::1] x_prev, const double[::1] z_prev,
+                const double[::1] wall_left, const double[::1] wall_right):
+    """Return an (n, 7) float64 array with one row per node:
+    direction, wallLeft x/z, wallRight x/z, trackCenter x/z.
+    """
+    cdef Py_ssize_t n = x.shape[0]
+    cdef Py_ssize_t i
+    cdef double direction, a, c, s, wlx, wlz, wrx, wrz
+    out_arr = np.empty((n, 7), dtype=np.float64)
+    cdef double[:, ::1] out = out_arr
+
+    for i in prange(n, nogil=True):
+        direction = -atan2(z_prev[i] - z[i], x[i] - x_prev[i]) * 180.0 / M_PI
+        # one cos/sin pair for both walls, see the note in fastlane_decoder.py
+        a = -direction * M_PI / 180.0
+        c = cos(a)
+        s = sin(a)
+        wlx = x[i] - s * wall_left[i]
+        wlz = z[i] - c * wall_left[i]
+        wrx = x[i] + s * wall_right[i]
+        wrz = z[i] + c * wall_right[i]
+        out[i, 0] = direction
+        out[i, 1] = wlx
+        out[i, 2] = wlz
+        out[i, 3] = wrx
+        out[i, 4] = wrz
+        out[i, 5] = (wlx + wrx) / 2.0
+        out[i, 6] = (wlz + wrz) / 2.0
+    return out_arr
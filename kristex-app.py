@@ -15,6 +15,11 @@ import json
 import time
 import threading
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 from fastlane_decoder import getNodesFromFastLane, nodes_to_dicts
 
 APP_NAME = "Kristex UDP Track Sender"
@@ -22,18 +27,40 @@ WIDTH = 500
 HEIGHT = 300
 
 _prepared_track_dicts = None
+_prepared_udp_blobs = None
 _prepare_error = None
 _prepare_lock = threading.Lock()
 udp_sock = None
+_udp_sock_lock = threading.Lock()
+UDP_SEND_BUFFER_SIZE = 1 << 20
 UDP_ADDR = ("127.0.0.1", 22566) #change port if needed
 NODE_SEND_DELAY = 0
 _last_cars_info_time = 0
 _last_player_info_time = 0
 CARS_TELEMETRY_UDP_INFO_INTERVAL = 0.01
 PLAYERS_INFO_UDP_INFO_INTERVAL = 0.01
-MAX_UDP_PACKET_SIZE = 1024
+# Datagram size limit. Loopback has a 64 KiB MTU, so local receivers get large
+# datagrams; anything else stays under a 1500-byte Ethernet MTU to avoid IP fragmentation.
+LOOPBACK_UDP_PACKET_SIZE = 60000
+NETWORK_UDP_PACKET_SIZE = 1400
+if UDP_ADDR[0] in ("127.0.0.1", "::1", "localhost"):
+    MAX_UDP_PACKET_SIZE = LOOPBACK_UDP_PACKET_SIZE
+else:
+    MAX_UDP_PACKET_SIZE = NETWORK_UDP_PACKET_SIZE
 send_button = None
 dicts = None
+_car_names_cache = {}
+_latest_snapshot = None
+_snapshot_lock = threading.Lock()
+_telemetry_stop = threading.Event()
+_telemetry_thread = None
+
+if orjson is not None:
+    def _dumps(obj):
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+else:
+    def _dumps(obj):
+        return json.dumps(obj, separators=(",", ":")).encode("utf-8")
 
 class PayloadType:
     TRACK_NODE = "track_node"
@@ -53,8 +80,19 @@ class UdpPayload(object):
         }
 
     def to_json_line(self):
-        import json
-        return json.dumps(self.to_dict(), separators=(",", ":")) + "\n"
+        return _dumps(self.to_dict()) + b"\n"
+
+# Pre-encoded UdpPayload framing for the hot paths: prefix + encoded data + _SFX
+# produces the same line as UdpPayload(...).to_json_line() without the wrapper.
+_PFX_TRACK_NODE = b'{"type":"track_node","data":'
+_PFX_CARS = b'{"type":"cars_info","data":'
+_PFX_PLAYERS = b'{"type":"players_info","data":'
+_SFX = b"}\n"
+
+# Pooled send buffer for the chunked cars/players packets, reused every tick
+_SEND_BUF = bytearray(max(MAX_UDP_PACKET_SIZE, 65536))
+_SEND_MV = memoryview(_SEND_BUF)
+_send_buf_lock = threading.Lock()
 
 # ---------------- AC Plugin Globals ----------------
 def acMain(ac_version):
@@ -66,19 +104,36 @@ def acMain(ac_version):
 
     ac.addRenderCallback(appWindow, appGL) 
     _start_background_sender_thread()
+    _start_telemetry_sender_thread()
     _init_buttons(app_window=appWindow)
     return APP_NAME
 
 
 def acUpdate(deltaT):
-    global _last_cars_info_time, _last_player_info_time
-    now = time.time()
-    if now - _last_cars_info_time >= CARS_TELEMETRY_UDP_INFO_INTERVAL:
+    # only read the sim here; serializing and sending happens on the telemetry thread
+    global _last_cars_info_time, _last_player_info_time, _latest_snapshot
+    now = time.monotonic()
+    read_cars = now - _last_cars_info_time >= CARS_TELEMETRY_UDP_INFO_INTERVAL
+    read_players = now - _last_player_info_time >= PLAYERS_INFO_UDP_INFO_INTERVAL
+    if not (read_cars or read_players):
+        return
+
+    # one read of the shared per-car state serves both payloads this tick
+    shared = read_shared_car_state()
+    telemetry = players = None
+    if read_cars:
         _last_cars_info_time = now
-        send_cars_telemetry_udp_chunked()
-    if now - _last_player_info_time >= PLAYERS_INFO_UDP_INFO_INTERVAL:
+        telemetry = get_all_cars_telemetry(shared)
+    if read_players:
         _last_player_info_time = now
-        send_players_info_udp_chunked()
+        players = get_all_players_info(shared)
+
+    with _snapshot_lock:
+        # latest wins: a snapshot the sender has not picked up yet is replaced
+        if _latest_snapshot is not None:
+            telemetry = _latest_snapshot[0] if telemetry is None else telemetry
+            players = _latest_snapshot[1] if players is None else players
+        _latest_snapshot = (telemetry, players)
 
 def appGL(deltaT):
     # no custom GL drawing here
@@ -86,6 +141,9 @@ def appGL(deltaT):
 
 def acShutdown():
     global udp_sock
+    _telemetry_stop.set()
+    if _telemetry_thread is not None:
+        _telemetry_thread.join(1.0)
     if udp_sock:
         try:
             udp_sock.close()
@@ -96,32 +154,79 @@ def acShutdown():
 # ---------------- UDP Sockets and Sending ----------------
 def init_udp_socket():
     global udp_sock
-    if udp_sock is None:
-        udp_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        try:
-            udp_sock.connect(UDP_ADDR)  # optional
-        except Exception:
-            pass
+    with _udp_sock_lock:
+        if udp_sock is None:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            try:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, UDP_SEND_BUFFER_SIZE)
+            except Exception:
+                pass
+            # never park a sender thread on a full buffer; the datagram is dropped instead
+            sock.setblocking(False)
+            try:
+                sock.connect(UDP_ADDR)  # optional
+            except Exception:
+                pass
+            udp_sock = sock
 
 def send_udp_payload(payload: UdpPayload):
+    send_udp_line(payload.to_json_line())
+
+def send_udp_line(line):
     global udp_sock
     init_udp_socket()
-    line = payload.to_json_line().encode("utf-8")
     try:
         udp_sock.send(line)
+    except BlockingIOError:
+        # send buffer full: drop, the next tick carries fresher data
+        pass
     except Exception:
         try:
             udp_sock.sendto(line, UDP_ADDR)
         except Exception as e:
             ac.log("[Kristex] Error sending UDP payload: {}".format(e))
 
+def _start_telemetry_sender_thread():
+    global _telemetry_thread
+    _telemetry_stop.clear()
+    _telemetry_thread = threading.Thread(target=_telemetry_sender_loop, daemon=True)
+    _telemetry_thread.start()
+    ac.log("[Kristex] Telemetry sender thread started.")
+
+def _telemetry_sender_loop():
+    """Send the snapshot latched by acUpdate at a fixed rate, off AC's update thread."""
+    global _latest_snapshot
+    interval = min(CARS_TELEMETRY_UDP_INFO_INTERVAL, PLAYERS_INFO_UDP_INFO_INTERVAL)
+    next_deadline = time.monotonic()
+    while not _telemetry_stop.is_set():
+        with _snapshot_lock:
+            snapshot = _latest_snapshot
+            _latest_snapshot = None
+
+        if snapshot is not None:
+            telemetry, players = snapshot
+            try:
+                if telemetry is not None:
+                    send_cars_telemetry_udp_chunked(telemetry)
+                if players is not None:
+                    send_players_info_udp_chunked(players)
+            except Exception as e:
+                ac.log("[Kristex] Telemetry send failed: {}".format(e))
+
+        next_deadline += interval
+        now = time.monotonic()
+        if next_deadline < now:
+            # fell behind (e.g. a slow send); don't burst to catch up
+            next_deadline = now
+        _telemetry_stop.wait(next_deadline - now)
+
 def _start_background_sender_thread():
     t = threading.Thread(target=_prepare_and_send_track_thread, daemon=True)
     t.start()
     ac.log("[Kristex] Background prepare/send thread started.")
 
 def _prepare_and_send_track_thread():
-    global _prepared_track_dicts, _prepare_error
+    global _prepared_track_dicts, _prepared_udp_blobs, _prepare_error
     try:
         track_name = ac.getTrackName(0)
         ac.log("[Kristex] track_name: '{}' ...".format(track_name))
@@ -138,53 +243,61 @@ def _prepare_and_send_track_thread():
 
         nodes = getNodesFromFastLane(ai_file)
         dicts = nodes_to_dicts(nodes, include_walls=False, subsample=5)
+        # the track does not change during a session, so encode it once for every (re)send
+        blobs = _encode_track_blobs(dicts)
 
         with _prepare_lock:
             _prepared_track_dicts = dicts
+            _prepared_udp_blobs = blobs
             _prepare_error = None
 
-        ac.log("[Kristex] Prepared {} nodes from '{}'.".format(len(dicts), ai_file))
+        ac.log("[Kristex] Prepared {} nodes ({} datagrams) from '{}'.".format(len(dicts), len(blobs), ai_file))
 
         # Immediately stream once on startup
-        _udp_stream_dicts(dicts)
+        _udp_stream_blobs(blobs)
 
     except Exception as e:
         with _prepare_lock:
             _prepared_track_dicts = None
+            _prepared_udp_blobs = None
             _prepare_error = str(e)
         ac.log("[Kristex] Preparing track failed: {}".format(str(e)))
 
 
-def _udp_stream_dicts(dicts):
-    """Stream a list of dicts over UDP, one JSON line per dict."""
-    if not dicts:
-        ac.log("[Kristex] No dicts to send.")
+def _coalesce_lines(lines):
+    """Group encoded JSON lines into datagrams of at most MAX_UDP_PACKET_SIZE bytes.
+
+    A single line larger than the limit is still sent as its own datagram.
+    """
+    buf = bytearray()
+    for line in lines:
+        if buf and len(buf) + len(line) > MAX_UDP_PACKET_SIZE:
+            yield bytes(buf)
+            buf = bytearray()
+        buf += line
+    if buf:
+        yield bytes(buf)
+
+def _encode_track_blobs(dicts):
+    """Encode track dicts as TRACK_NODE JSON lines packed into UDP datagrams."""
+    # single-line JSON (no extra whitespace) per node, followed by newline
+    lines = (_PFX_TRACK_NODE + _dumps(d) + _SFX for d in dicts)
+    return list(_coalesce_lines(lines))
+
+def _udp_stream_blobs(blobs):
+    """Stream pre-encoded track datagrams (see _encode_track_blobs) over UDP."""
+    if not blobs:
+        ac.log("[Kristex] No track data to send.")
         return
 
     try:
-        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        # optional small connect to set default destination for send (not required for UDP)
-        try:
-            sock.connect(UDP_ADDR)
-        except Exception:
-            # ignore connect errors; we'll still use sendto below if connect fails
-            pass
+        # reuse the app-wide socket (closed in acShutdown) instead of opening one per stream
+        init_udp_socket()
 
-        total = len(dicts)
         ac.log("[Kristex] Streaming nodes over UDP to {}:{} ...".format(str(UDP_ADDR[0]), str(UDP_ADDR[1])))
 
-        for i, d in enumerate(dicts):
-            try:
-                payload = UdpPayload(PayloadType.TRACK_NODE, d)
-                # single-line JSON (no extra whitespace), followed by newline
-                line = payload.to_json_line()
-                # if socket connected successfully, use send(), else use sendto
-                try:
-                    sock.send(line.encode("utf-8"))
-                except Exception:
-                    sock.sendto(line.encode("utf-8"), UDP_ADDR)
-            except Exception as send_e:
-                ac.log("[Kristex] Error sending node")
+        for blob in blobs:
+            send_udp_line(blob)
             # small delay to avoid saturating local network / receiver
             if NODE_SEND_DELAY > 0:
                 time.sleep(NODE_SEND_DELAY)
@@ -192,67 +305,92 @@ def _udp_stream_dicts(dicts):
         ac.log("[Kristex] Finished streaming nodes.")
     except Exception as e:
         ac.log("[Kristex] UDP streaming failed: {}".format(e))
-    finally:
+
+def _get_car_names(car_id, connected):
+    """Return (car_name, driver_name) for car_id, cached for the session.
+
+    The names only change when a driver joins or leaves the slot, so they are
+    re-queried only when the car's connection state changes.
+    """
+    cached = _car_names_cache.get(car_id)
+    if cached is None or cached[0] != connected:
+        cached = (connected, ac.getCarName(car_id), ac.getDriverName(car_id))
+        _car_names_cache[car_id] = cached
+    return cached[1], cached[2]
+
+def read_shared_car_state():
+    """Read the per-car state used by both the telemetry and the players payloads.
+
+    Taken once per tick and passed to get_all_cars_telemetry / get_all_players_info
+    so those values are not fetched from the sim twice.
+    """
+    shared = []
+    for car_id in range(ac.getCarsCount()):
         try:
-            sock.close()
-        except Exception:
-            pass
+            connected = ac.isConnected(car_id)
+            car_name, driver_name = _get_car_names(car_id, connected)
+            shared.append({
+                "id": car_id,
+                "car_name": car_name,
+                "driver_name": driver_name,
+                "connected": connected,
+                "best_lap": ac.getCarState(car_id, acsys.CS.BestLap),
+            })
+        except Exception as e:
+            ac.log("[Kristex] Error reading state for car {}: {}".format(car_id, e))
+    return shared
 
-def get_all_cars_telemetry():
+def get_all_cars_telemetry(shared=None):
     telemetry_list = []
-    car_count = ac.getCarsCount()
-    
-    for car_id in range(car_count):
+    if shared is None:
+        shared = read_shared_car_state()
+
+    for car in shared:
+        car_id = car["id"]
         try:
-            car_name = ac.getCarName(car_id)
             pos = ac.getCarState(car_id, acsys.CS.WorldPosition)
             speed = ac.getCarState(car_id, acsys.CS.SpeedTotal)
-            best_lap = ac.getCarState(car_id, acsys.CS.BestLap)
-            connected = ac.isConnected(car_id)
 
             telemetry_list.append({
                 "id": car_id,
-                "name": car_name,
+                "name": car["car_name"],
                 "position": {"x": pos[2], "y": pos[1], "z": -pos[0]},
                 "speed": {"kmh": speed[0], "mph": speed[1], "ms": speed[2]},
-                "connected": connected,
-                "best_lap": best_lap
+                "connected": car["connected"],
+                "best_lap": car["best_lap"]
             })
             
         except Exception as e:
             ac.log("[Kristex] Error reading telemetry for car {}: {}".format(car_id, e))
     return telemetry_list
 
-def get_all_players_info():
-    # Placeholder function to simulate player info retrieval
+def get_all_players_info(shared=None):
     players_info = []
-    car_count = ac.getCarsCount()
-    
-    for car_id in range(car_count):
+    if shared is None:
+        shared = read_shared_car_state()
+
+    for car in shared:
+        car_id = car["id"]
         try:
-            player_best_lap = ac.getCarState(car_id, acsys.CS.BestLap)
             player_current_lap = ac.getCarState(car_id, acsys.CS.LapTime)
             player_last_lap = ac.getCarState(car_id, acsys.CS.LastLap)
 
-            player_name = ac.getDriverName(car_id)
-            player_car_name = ac.getCarName(car_id)
             player_in_pit = ac.isCarInPitlane(car_id)
             player_in_box = ac.isCarInPit(car_id)
-            player_connected = ac.isConnected(car_id)
             player_leaderborad_pos = ac.getCarLeaderboardPosition(car_id)
             player_realtime_leaderboard_pos = ac.getCarRealTimeLeaderboardPosition(car_id)
             player_tyres = ac.getCarTyreCompound(car_id)
             player_splits = ac.getLastSplits(car_id)
             players_info.append({
                 "id": car_id,
-                "player_name": player_name,
-                "car_name": player_car_name,
-                "best_lap": player_best_lap,
+                "player_name": car["driver_name"],
+                "car_name": car["car_name"],
+                "best_lap": car["best_lap"],
                 "current_lap": player_current_lap,
                 "last_lap": player_last_lap,
                 "in_pit": player_in_pit,
                 "in_box": player_in_box,
-                "is_connected": player_connected,
+                "is_connected": car["connected"],
                 "leaderboard_pos": player_leaderborad_pos,
                 "realtime_leaderboard_pos": player_realtime_leaderboard_pos,
                 "tyre_compound": player_tyres,
@@ -262,61 +400,65 @@ def get_all_players_info():
             ac.log("[Kristex] Error reading player info for car {}: {}".format(car_id, e))
     return players_info
 
-def send_cars_telemetry_udp_chunked():
-    telemetry_data = get_all_cars_telemetry()
+def _send_records_udp_chunked(prefix, records):
+    """Send records as one or more list payloads of at most MAX_UDP_PACKET_SIZE bytes.
+
+    prefix is the pre-encoded payload head (e.g. _PFX_CARS). Each record is
+    serialized exactly once and copied into the pooled _SEND_BUF, which is sent
+    through a memoryview slice, so no per-packet bytes object is built.
+    """
+    head = prefix + b"["
+    tail = b"]" + _SFX
+    mv = _SEND_MV
+    capacity = len(_SEND_BUF) - len(tail)
+
+    with _send_buf_lock:
+        mv[:len(head)] = head
+        n = len(head)
+        count = 0
+
+        for record in records:
+            record_bytes = _dumps(record)
+            m = len(record_bytes)
+
+            # If adding this record (plus separator) exceeds max packet size, send current chunk
+            if count and n + 1 + m + len(tail) > MAX_UDP_PACKET_SIZE:
+                mv[n:n + len(tail)] = tail
+                send_udp_line(mv[:n + len(tail)])
+                n = len(head)
+                count = 0
+
+            if count:
+                mv[n] = 0x2C  # ","
+                n += 1
+            elif n + m > capacity:
+                # a single record larger than the pooled buffer goes out on its own
+                send_udp_line(head + record_bytes + tail)
+                continue
+            mv[n:n + m] = record_bytes
+            n += m
+            count += 1
+
+        # Send any remaining records
+        if count:
+            mv[n:n + len(tail)] = tail
+            send_udp_line(mv[:n + len(tail)])
+
+def send_cars_telemetry_udp_chunked(telemetry_data=None):
+    if telemetry_data is None:
+        telemetry_data = get_all_cars_telemetry()
     if not telemetry_data:
         ac.log("[Kristex] No telemetry data to send.")
         return
+    _send_records_udp_chunked(_PFX_CARS, telemetry_data)
 
-    chunk = []
-    chunk_size = 0
-
-    for car in telemetry_data:
-        # Estimate the JSON size for this car
-        car_json = json.dumps(car, separators=(",", ":"))
-        car_bytes = car_json.encode("utf-8")
-
-        # If adding this car exceeds max packet size, send current chunk
-        if chunk_size + len(car_bytes) > MAX_UDP_PACKET_SIZE:
-            payload = UdpPayload(PayloadType.CARS_INFO, chunk)
-            send_udp_payload(payload)
-            chunk = []
-            chunk_size = 0
-
-        chunk.append(car)
-        chunk_size += len(car_bytes)
-
-    # Send any remaining cars
-    if chunk:
-        payload = UdpPayload(PayloadType.CARS_INFO, chunk)
-        send_udp_payload(payload)
-
-def send_players_info_udp_chunked():
-    players_info = get_all_players_info()
+def send_players_info_udp_chunked(players_info=None):
+    if players_info is None:
+        players_info = get_all_players_info()
     if not players_info:
         ac.log("[Kristex] No players data to send.")
         return
-
-    chunk = []
-    chunk_size = 0
-
-    for player in players_info:
-        # Estimate the JSON size for this player without double dumping
-        player_json = json.dumps(player, separators=(",", ":"))
-        player_bytes = player_json.encode("utf-8")
-
-        if chunk_size + len(player_bytes) > MAX_UDP_PACKET_SIZE:
-            payload = UdpPayload(PayloadType.PLAYERS_INFO, chunk)
-            send_udp_payload(payload)
-            chunk = []
-            chunk_size = 0
-
-        chunk.append(player)   # <-- keep dict, not json string
-        chunk_size += len(player_bytes)
-
-    if chunk:
-        payload = UdpPayload(PayloadType.PLAYERS_INFO, chunk)
-        send_udp_payload(payload)
+    _send_records_udp_chunked(_PFX_PLAYERS, players_info)
 
 
 # ---------------- UI and Button Handling ----------------
@@ -328,21 +470,21 @@ def _init_buttons(app_window):
     ac.addOnClickedListener(send_button, _on_send_button_clicked)
 
 def _on_send_button_clicked(control, state):
-    global _prepared_track_dicts, _prepare_error
+    global _prepared_udp_blobs, _prepare_error
     ac.log("[Kristex] Send button clicked.")
     with _prepare_lock:
-        dicts = None if _prepared_track_dicts is None else list(_prepared_track_dicts)
+        blobs = _prepared_udp_blobs
         err = _prepare_error
 
     if err:
         ac.log("[Kristex] Cannot send - prepare error: {}".format(err))
         return
 
-    if not dicts:
+    if not blobs:
         ac.log("[Kristex] No prepared track data to send.")
         return
 
     # spawn a short-lived thread to stream again (so button handler returns immediately)
-    t = threading.Thread(target=_udp_stream_dicts, args=(dicts,), daemon=True)
+    t = threading.Thread(target=_udp_stream_blobs, args=(blobs,), daemon=True)
     t.start()
     ac.log("[Kristex] Started resend thread.")